@@ -1,51 +1,30 @@
-import re
 import os
+import base64
 import folium
+from branca.element import MacroElement
+from jinja2 import Template
 from streamlit_folium import st_folium
 import streamlit as st
-import pandas as pd
 import plotly.express as px
 from datetime import datetime, timedelta
-import io
-import sys
 import logging
-from fpdf import FPDF
-from fpdf.enums import XPos, YPos
+import io
 import plotly.graph_objects as go
 from pathlib import Path
 
+import waze_snapshots
+from waze_core import (
+    ANOMALIE_FENETRE, ANOMALIE_MIN_JOURS_ACTIFS, ANOMALIE_SEUIL, EXPORT_FORMATS, ICONES,
+    PERIODES_STANDARD, build_report_charts, detect_anomalies, export_selection, filter_anomalies,
+    filter_waze, generate_pdf_report, load_waze_data, periode_dates
+)
+
 # =============================
 # LOGGING
 # =============================
 logging.getLogger('fpdf').setLevel(logging.ERROR)
 logging.getLogger().setLevel(logging.ERROR)
 
-# =============================
-# ICONES
-# =============================
-ICONES = {
-    "Trafic dense": "https://img.icons8.com/color/48/traffic-jam.png",
-    "Trafic à l’arrêt": "https://img.icons8.com/color/24/traffic-jam.png",
-    "Accident léger": "https://img.icons8.com/color/48/car-crash.png",
-    "Accident grave": "https://img.icons8.com/color/48/car-accident.png",
-    "Nid-de-poule": "https://img.icons8.com/color/48/road-worker.png",
-    "Panne de feu tricolore": "https://img.icons8.com/color/48/traffic-light.png",
-    "Inondation": "https://img.icons8.com/color/48/floods.png"
-}
-
-# =============================
-# GRAVITÉ DES SCÉNARIOS
-# =============================
-GRAVITE = {
-    "Accident grave": 5,
-    "Inondation": 4,
-    "Bouchon – trafic à l'arrêt": 3,
-    "Accident léger": 3,
-    "Bouchon – trafic dense": 2,
-    "Panne de feu tricolore": 2,
-    "Nid-de-poule": 1
-}
-
 # =============================
 # CONFIG STREAMLIT
 # =============================
@@ -54,143 +33,94 @@ st.set_page_config(
     layout="wide"
 )
 
-# =============================
-# VILLES AUTORISÉES
-# =============================
-VILLES_SERVICE_COMMUN = [
-    "Palaiseau", "Orsay", "Villejust", "Ballainvilliers",
-    "Verrières-le-Buisson", "La Ville-du-Bois", "Les Ulis",
-    "Saclay", "Wissous", "Villebon-sur-Yvette",
-    "Saulx-les-Chartreux", "Villiers-le-Bâcle", "Linas",
-    "Vauhallan", "Saint-Aubin", "Longjumeau",
-    "Marcoussis", "Nozay", "Epinay-sur-Orge", "Igny"
-]
-
-# =============================
-# MAPPING FICHIERS → SCÉNARIOS
-# =============================
-FILES = {
-    "Waze heavy traffic.csv": "Bouchon – trafic dense",
-    "Waze stand still traffic.csv": "Bouchon – trafic à l’arrêt",
-    "Waze accident minor.csv": "Accident léger",
-    "Waze accident major.csv": "Accident grave",
-    "Waze pot_hole.csv": "Nid-de-poule",
-    "HAZARD_ON_ROAD_TRAFFIC_LIGHT_FAULT.csv": "Panne de feu tricolore",
-    "HAZARD_WEATHER_FLOOD.csv": "Inondation"
-}
-
-# =============================
-# HELPERS
-# =============================
-def _parse_location_column(df, location_col="Location"):
-    """
-    Remplit df['latitude'] et df['longitude'] à partir de la colonne Location
-    (formats acceptés: 'POINT(lon lat)' ou 'lat,lon' / 'lon,lat').
-    """
-    if location_col not in df.columns:
-        return df
-
-    def _extract_lat_lon(val):
-        if pd.isna(val):
-            return (None, None)
-        s = str(val)
-
-        # WKT: POINT(lon lat)
-        m = re.search(r"POINT\s*\(\s*([-+]?\d*\.?\d+)[\s,]+([-+]?\d*\.?\d+)\s*\)", s, re.IGNORECASE)
-        if m:
-            try:
-                lon = float(m.group(1))
-                lat = float(m.group(2))
-                return (lat, lon)
-            except Exception:
-                return (None, None)
-
-        # fallback: "a b" ou "a,b" (essaie de déduire lat/lon)
-        m2 = re.search(r"([-+]?\d*\.?\d+)[\s,;]+([-+]?\d*\.?\d+)", s)
-        if m2:
-            a = float(m2.group(1)); b = float(m2.group(2))
-            # heuristique: lat FR ~ [40, 60]
-            if 40 <= a <= 60:
-                return (a, b)
-            if 40 <= b <= 60:
-                return (b, a)
-            # par défaut: (a, b) comme (lat, lon)
-            return (a, b)
-        return (None, None)
-
-    lats, lons = [], []
-    for v in df[location_col]:
-        lat, lon = _extract_lat_lon(v)
-        lats.append(lat)
-        lons.append(lon)
-
-    df = df.copy()
-    df["latitude"] = pd.to_numeric(pd.Series(lats), errors="coerce")
-    df["longitude"] = pd.to_numeric(pd.Series(lons), errors="coerce")
-    return df
-
 # =============================
 # CHARGEMENT DES DONNÉES (AVEC CACHE)
 # =============================
+# Renvoie (waze, fichiers absents) : l'avertissement est affiché une seule fois
+# dans le corps du script, jamais depuis une fonction en cache (qui le rejouerait).
 @st.cache_data
 def load_data():
-    base_dir = Path(__file__).resolve().parent
-    dfs = []
-    missing = []
-
-    for file_name, scenario in FILES.items():
-        path = base_dir / file_name
-        if not path.exists():
-            missing.append(file_name)
-            continue
-
-        df = pd.read_csv(path, low_memory=False)
-
-        # Normalisation colonnes
-        if "City" not in df.columns:
-            df["City"] = "Inconnue"
-        else:
-            df["City"] = df["City"].fillna("Inconnue")
-
-        if "Street" not in df.columns:
-            df["Street"] = ""
-
-        if "Date" in df.columns:
-            df["Date"] = pd.to_datetime(df["Date"], errors="coerce", dayfirst=True)
-        else:
-            df["Date"] = pd.NaT
-
-        # Extraire lat/lon
-        df = _parse_location_column(df, "Location")
-
-        # Scénario (depuis le nom du fichier)
-        df["scenario"] = scenario
-
-        dfs.append(df)
-
-    if missing:
-        st.warning(f"Fichiers absents dans {base_dir}: {', '.join(missing)}")
+    return load_waze_data()
 
-    if not dfs:
-        raise FileNotFoundError("Aucun CSV valide trouvé.")
-
-    # Concat
-    waze = pd.concat(dfs, ignore_index=True)
-    waze["City"] = waze["City"].fillna("Inconnue")
+@st.cache_data
+def get_cached_anomalies():
+    waze, _ = load_data()
+    return detect_anomalies(waze)
 
-    # Filtre service commun
-    waze_filtered = waze[waze["City"].isin(VILLES_SERVICE_COMMUN)].copy()
-    # Gravité
-    waze_filtered["gravite"] = waze_filtered["scenario"].map(GRAVITE).fillna(1).astype(int)
+# Instantanés en lecture seule : cache_resource évite de re-désérialiser les figures à chaque rerun
+@st.cache_resource
+def get_cached_snapshot(path, generated_at):
+    return waze_snapshots.load_snapshot(path)
 
-    return waze_filtered
+@st.cache_resource
+def get_cached_snapshot_alertes(generated_at):
+    return waze_snapshots.load_alertes()
 
-# Chargement initial
-waze = load_data()
+# Instantanés pré-calculés (None si absents ou périmés) : évitent load_data au premier affichage
+snapshot_index = waze_snapshots.load_index()
 
 # =============================
 # CARTE
 # =============================
+@st.cache_data
+def get_icon_data_uris():
+    """Icônes des scénarios encodées une seule fois en data URI (carte hors ligne)."""
+    base_dir = Path(__file__).resolve().parent
+    uris = {}
+    for scenario, icon_path in ICONES.items():
+        path = base_dir / icon_path
+        if path.exists():
+            uris[scenario] = "data:image/svg+xml;base64," + base64.b64encode(path.read_bytes()).decode("ascii")
+    return uris
+
+class WazeMarkers(MacroElement):
+    """
+    Marqueurs Waze rendus côté navigateur à partir d'un tableau compact.
+
+    Chaque icône de scénario est déclarée une seule fois (L.icon partagé) ;
+    les marqueurs ne portent que leur position, l'index de leur icône et les
+    champs du popup, au lieu d'un CustomIcon + popup HTML par point.
+    """
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function() {
+            var scenarios = {{ this.scenarios|tojson }};
+            var icones = {{ this.icones|tojson }}.map(function(url) {
+                return url ? L.icon({iconUrl: url, iconSize: [28, 28], iconAnchor: [14, 14], popupAnchor: [0, -14]})
+                           : new L.Icon.Default();
+            });
+            function esc(s) {
+                return String(s).replace(/[&<>"']/g, function(c) {
+                    return {"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#39;"}[c];
+                });
+            }
+            {{ this.points|tojson }}.forEach(function(p) {
+                L.marker([p[0], p[1]], {icon: icones[p[2]]})
+                    .bindPopup("<div><b>Scénario :</b> " + esc(scenarios[p[2]]) +
+                               "<br><b>Ville :</b> " + esc(p[3]) +
+                               "<br><b>Rue :</b> " + esc(p[4]) +
+                               "<br><b>Date :</b> " + esc(p[5]) + "</div>")
+                    .addTo({{ this._parent.get_name() }});
+            });
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, df, icon_uris):
+        super().__init__()
+        self._name = "WazeMarkers"
+        self.scenarios = sorted(df["scenario"].dropna().unique())
+        self.icones = [icon_uris.get(s) for s in self.scenarios]
+        scenario_idx = df["scenario"].map({s: i for i, s in enumerate(self.scenarios)})
+        self.points = list(zip(
+            df["latitude"].astype(float).round(6).tolist(),
+            df["longitude"].astype(float).round(6).tolist(),
+            scenario_idx.astype(int).tolist(),
+            df["City"].astype(str).tolist(),
+            df["Street"].fillna("").astype(str).tolist(),
+            df["Date"].dt.strftime("%d/%m/%Y").fillna("").tolist()
+        ))
+
 def generate_waze_map(df):
     df = df.copy()
 
@@ -198,7 +128,7 @@ def generate_waze_map(df):
         st.warning("Aucune colonne latitude/longitude détectée.")
         return folium.Map(location=[48.7, 2.25], zoom_start=11, tiles="CartoDB positron")
 
-    df = df.dropna(subset=["latitude", "longitude"])
+    df = df.dropna(subset=["latitude", "longitude", "scenario"])
     if df.empty:
         st.info("Aucun point géolocalisé.")
         return folium.Map(location=[48.7, 2.25], zoom_start=11, tiles="CartoDB positron")
@@ -209,215 +139,20 @@ def generate_waze_map(df):
         center = [48.7, 2.25]
 
     m = folium.Map(location=center, zoom_start=11, tiles="CartoDB positron")
-
-    for _, row in df.iterrows():
-        lat = row["latitude"]
-        lon = row["longitude"]
-
-        # Icône (URL si disponible)
-        icon_path = ICONES.get(row.get("scenario", ""), None)
-        icon = folium.Icon(icon="info-sign")
-        if icon_path:
-            try:
-                if isinstance(icon_path, str) and icon_path.startswith(("http://", "https://")):
-                    icon = folium.CustomIcon(icon_image=icon_path, icon_size=(28, 28))
-            except Exception:
-                pass
-
-        popup_html = f"""
-        <div>
-        <b>Scénario :</b> {row.get('scenario')}<br>
-        <b>Ville :</b> {row.get('City')}<br>
-        <b>Rue :</b> {row.get('Street')}<br>
-        <b>Date :</b> {row.get('Date')}
-        </div>
-        """
-
-        folium.Marker([lat, lon], icon=icon, popup=popup_html).add_to(m)
+    WazeMarkers(df, get_icon_data_uris()).add_to(m)
 
     return m
 
 # =============================
-# FONCTIONS PDF (inchangé)
+# PDF (EN CACHE)
 # =============================
-def _generate_pdf_report(ville, df):
-    """Internal PDF generation function without caching"""
-    old_stdout = sys.stdout
-    sys.stdout = io.StringIO()
-    try:
-        pdf = FPDF()
-        pdf.add_page()
-
-        color_header = (52, 152, 219)  # Bleu
-        color_light = (236, 240, 241)  # Gris clair
-        color_text = (44, 62, 80)      # Gris foncé
-
-        # En-tête
-        pdf.set_fill_color(*color_header)
-        pdf.set_text_color(255, 255, 255)
-        pdf.set_font("helvetica", "B", 22)
-        clean_ville = ville.encode('ascii', 'ignore').decode('ascii')
-        pdf.cell(0, 20, "RAPPORT WAZE", new_x=XPos.LMARGIN, new_y=YPos.NEXT, fill=True)
-        pdf.set_font("helvetica", "", 14)
-        pdf.cell(0, 12, f"{clean_ville}", new_x=XPos.LMARGIN, new_y=YPos.NEXT, fill=True)
-        pdf.ln(5)
-
-        # Infos rapport
-        pdf.set_text_color(*color_text)
-        pdf.set_font("helvetica", "", 10)
-        rapport_date = datetime.now().strftime('%d/%m/%Y à %H:%M')
-        pdf.cell(0, 8, f"Date du rapport: {rapport_date}", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-
-        if len(df) > 0:
-            date_min = df['Date'].min().date()
-            date_max = df['Date'].max().date()
-            pdf.cell(0, 8, f"Période analysée: {date_min} au {date_max}", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-        pdf.ln(3)
-
-        # 1. Résumé
-        pdf.set_fill_color(*color_light)
-        pdf.set_font("helvetica", "B", 12)
-        pdf.cell(0, 10, "1. RESUME STATISTIQUE", new_x=XPos.LMARGIN, new_y=YPos.NEXT, fill=True)
-        pdf.ln(2)
-
-        pdf.set_font("helvetica", "", 10)
-        total_alerts = len(df)
-        pdf.cell(0, 8, f"Total de signalements: {total_alerts}", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-
-        if len(df) > 0:
-            avg_per_day = total_alerts / ((df['Date'].max() - df['Date'].min()).days + 1)
-            pdf.cell(0, 8, f"Moyenne par jour: {avg_per_day:.1f}", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-
-        pdf.ln(5)
-
-        # 2. Répartition par scénario
-        pdf.set_fill_color(*color_light)
-        pdf.set_font("helvetica", "B", 12)
-        pdf.cell(0, 10, "2. REPARTITION PAR SCENARIO", new_x=XPos.LMARGIN, new_y=YPos.NEXT, fill=True)
-        pdf.ln(2)
-
-        pdf.set_font("helvetica", "B", 9)
-        pdf.set_fill_color(*color_header)
-        pdf.set_text_color(255, 255, 255)
-        pdf.cell(130, 8, "Scénario", border=1, fill=True)
-        pdf.cell(50, 8, "Nombre", border=1, new_x=XPos.LMARGIN, new_y=YPos.NEXT, fill=True, align="C")
-
-        pdf.set_text_color(*color_text)
-        pdf.set_font("helvetica", "", 9)
-        pdf.set_fill_color(245, 245, 245)
-
-        scenario_counts = df["scenario"].value_counts().sort_values(ascending=False)
-        fill = False
-        for scenario, count in scenario_counts.items():
-            clean_scenario = scenario.encode('ascii', 'ignore').decode('ascii')
-            percentage = (count / total_alerts * 100) if total_alerts > 0 else 0
-
-            pdf.set_fill_color(245, 245, 245) if fill else pdf.set_fill_color(255, 255, 255)
-            pdf.cell(130, 7, clean_scenario, border=1, fill=fill)
-            pdf.cell(50, 7, f"{count} ({percentage:.1f}%)", border=1, new_x=XPos.LMARGIN, new_y=YPos.NEXT, fill=fill, align="C")
-            fill = not fill
-
-        pdf.ln(5)
-
-        # 3. Top rues
-        pdf.set_font("helvetica", "B", 12)
-        pdf.cell(0, 10, "3. TOP 10 RUES LES PLUS ACTIVES", new_x=XPos.LMARGIN, new_y=YPos.NEXT, fill=True)
-        pdf.ln(2)
-
-        pdf.set_font("helvetica", "B", 9)
-        pdf.set_fill_color(*color_header)
-        pdf.set_text_color(255, 255, 255)
-        pdf.cell(130, 8, "Rue", border=1, fill=True)
-        pdf.cell(50, 8, "Signalements", border=1, new_x=XPos.LMARGIN, new_y=YPos.NEXT, fill=True, align="C")
-
-        pdf.set_text_color(*color_text)
-        pdf.set_font("helvetica", "", 8)
-        top_streets = df["Street"].value_counts().head(10)
-        fill = False
-        for street, count in top_streets.items():
-            clean_street = str(street).encode('ascii', 'ignore').decode('ascii')[:50]
-            pdf.set_fill_color(245, 245, 245) if fill else pdf.set_fill_color(255, 255, 255)
-            pdf.cell(130, 7, clean_street, border=1, fill=fill)
-            pdf.cell(50, 7, f"{count}", border=1, new_x=XPos.LMARGIN, new_y=YPos.NEXT, fill=fill, align="C")
-            fill = not fill
-
-        pdf.ln(5)
-
-        # 4. Analyse détaillée par type
-        pdf.set_fill_color(*color_light)
-        pdf.set_font("helvetica", "B", 12)
-        pdf.cell(0, 10, "4. ANALYSE DETAILLEE PAR TYPE", new_x=XPos.LMARGIN, new_y=YPos.NEXT, fill=True)
-        pdf.ln(3)
-
-        pdf.set_font("helvetica", "", 9)
-        scenarios_to_analyze = [
-            ("Accident", "Accidents"),
-            ("Inondation", "Inondations"),
-            ("Bouchon", "Bouchons")
-        ]
-
-        for keyword, label in scenarios_to_analyze:
-            df_filtered = df[df["scenario"].str.contains(keyword, na=False)]
-            if len(df_filtered) > 0:
-                pdf.set_font("helvetica", "B", 10)
-                pdf.cell(0, 8, f"{label}: {len(df_filtered)} signalements", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-
-                top_streets_scenario = df_filtered["Street"].value_counts().head(5)
-                pdf.set_font("helvetica", "", 8)
-                for street, count in top_streets_scenario.items():
-                    clean_street = str(street).encode('ascii', 'ignore').decode('ascii')[:60]
-                    pdf.cell(0, 6, f"   - {clean_street}: {count}", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-                pdf.ln(2)
-
-        # 5. Conclusion
-        pdf.add_page()
-        pdf.set_fill_color(*color_light)
-        pdf.set_font("helvetica", "B", 12)
-        pdf.cell(0, 10, "5. CONCLUSION", new_x=XPos.LMARGIN, new_y=YPos.NEXT, fill=True)
-        pdf.ln(3)
-
-        pdf.set_font("helvetica", "", 10)
-        conclusion_text = (
-            "Ce rapport d'activité Waze fournit une analyse détaillée des incidents routiers "
-            "et des événements signalés. Les données collectées permettent d'identifier les "
-            "zones et types d'événements prioritaires pour orienter les actions de prévention "
-            "et de gestion du trafic."
-        )
-        pdf.multi_cell(0, 5, conclusion_text)
-        pdf.ln(5)
-
-        pdf.set_font("helvetica", "", 8)
-        pdf.set_text_color(150, 150, 150)
-        pdf.cell(0, 10, "Rapport généré automatiquement - Données Waze",
-                 new_x=XPos.LMARGIN, new_y=YPos.NEXT, align="C")
-
-        return bytes(pdf.output())
-    finally:
-        sys.stdout = old_stdout
-
-def generate_pdf_report(ville, df):
-    old_stdout = sys.stdout
-    old_stderr = sys.stderr
-    try:
-        sys.stdout = io.StringIO()
-        sys.stderr = io.StringIO()
-        result = _generate_pdf_report(ville, df)
-        return result
-    finally:
-        sys.stdout = old_stdout
-        sys.stderr = old_stderr
-
 @st.cache_data
 def get_cached_pdf(ville, date_tuple):
-    date_min, date_max = date_tuple
-    if isinstance(ville, list):
-        ville_str = ville[0] if ville else "Rapport"
-        df_filtered = waze[waze["City"].isin(ville)].copy()
-    else:
-        ville_str = ville
-        df_filtered = waze[waze["City"] == ville].copy()
-    df_filtered = df_filtered[(df_filtered["Date"].dt.date >= date_min) & (df_filtered["Date"].dt.date <= date_max)]
-    return generate_pdf_report(ville_str, df_filtered)
+    ville_str = (ville[0] if ville else "Rapport") if isinstance(ville, list) else ville
+    waze, _ = load_data()
+    df_filtered = filter_waze(waze, ville, date_tuple)
+    alertes = filter_anomalies(get_cached_anomalies(), ville, date_tuple)
+    return generate_pdf_report(ville_str, df_filtered, alertes)
 
 # =============================
 # SIDEBAR
@@ -429,41 +164,63 @@ if st.sidebar.button("🔄 Actualiser les données"):
     st.cache_data.clear()
     st.rerun()
 
+if snapshot_index is not None:
+    missing = snapshot_index["missing"]
+    villes_disponibles = snapshot_index["villes"]
+    date_min_data, date_max_data = snapshot_index["date_min"], snapshot_index["date_max"]
+else:
+    waze, missing = load_data()
+    villes_disponibles = sorted(waze["City"].unique())
+    date_min_data, date_max_data = waze["Date"].min().date(), waze["Date"].max().date()
+
+if missing:
+    st.warning(f"Fichiers absents dans {Path(__file__).resolve().parent}: {', '.join(missing)}")
+
 ville = st.sidebar.multiselect(
     "Ville(s)",
-    sorted(waze["City"].unique()),
+    villes_disponibles,
     default=["Palaiseau"]
 )
 
 # Sélecteur de date
 st.sidebar.markdown("### 📅 Filtre par Date")
+periode = st.sidebar.selectbox("Période", list(PERIODES_STANDARD))
 date_range = st.sidebar.date_input(
     "Sélectionner la plage de dates",
-    value=(waze["Date"].min().date(), waze["Date"].max().date()),
-    min_value=waze["Date"].min().date(),
-    max_value=waze["Date"].max().date()
+    value=periode_dates(periode, date_min_data, date_max_data),
+    min_value=date_min_data,
+    max_value=date_max_data
 )
 
-# DataFrame global (ville + dates) utilisé par TOUT le dashboard (sauf le filtre carte)
-df = waze[waze["City"].isin(ville)].copy() if isinstance(ville, list) else waze[waze["City"] == ville].copy()
-
-# Appliquer le filtre de date global
 if isinstance(date_range, tuple) and len(date_range) == 2:
-    df = df[(df["Date"].dt.date >= date_range[0]) & (df["Date"].dt.date <= date_range[1])]
-elif isinstance(date_range, type(pd.Timestamp.now().date())):
-    df = df[df["Date"].dt.date == date_range]
+    date_tuple = date_range
+elif isinstance(date_range, tuple):
+    # Sélection de plage en cours : pas de filtre de date
+    date_tuple = (date_min_data, date_max_data)
+else:
+    date_tuple = (date_range, date_range)
+
+# DataFrame global (ville + dates) utilisé par TOUT le dashboard (sauf le filtre carte)
+snapshot_path = waze_snapshots.find_snapshot(snapshot_index, ville, date_tuple)
+if snapshot_path is not None:
+    snapshot = get_cached_snapshot(str(snapshot_path), snapshot_index["generated_at"])
+    df = snapshot["df"]
+else:
+    snapshot = None
+    waze, _ = load_data()
+    df = filter_waze(waze, ville, date_tuple)
 
 st.sidebar.markdown("---")
 st.sidebar.markdown("### 📥 Exporter")
 
-# Génération PDF (en cache)
-pdf_placeholder = st.sidebar.empty()
-with pdf_placeholder.container():
-    if isinstance(date_range, tuple) and len(date_range) == 2:
-        pdf_data = get_cached_pdf(ville, date_range)
-    else:
-        pdf_data = get_cached_pdf(ville, (date_range, date_range))
-    pdf_placeholder.empty()
+# Génération PDF (instantané ou en cache)
+if snapshot is not None:
+    pdf_data = snapshot["pdf"]
+else:
+    pdf_placeholder = st.sidebar.empty()
+    with pdf_placeholder.container():
+        pdf_data = get_cached_pdf(ville, date_tuple)
+        pdf_placeholder.empty()
 
 st.sidebar.download_button(
     label="📄 Télécharger en PDF",
@@ -472,6 +229,34 @@ st.sidebar.download_button(
     mime="application/pdf"
 )
 
+# Export des données filtrées : généré uniquement au clic
+scenarios_export = st.sidebar.multiselect(
+    "Scénarios à exporter",
+    options=sorted(df["scenario"].dropna().unique()),
+    default=sorted(df["scenario"].dropna().unique()),
+    key="filtre_scenario_export"
+)
+format_export = st.sidebar.selectbox(
+    "Format des données",
+    list(EXPORT_FORMATS),
+    format_func=lambda fmt: EXPORT_FORMATS[fmt][0]
+)
+
+def export_data():
+    # Le bouton de téléchargement Streamlit exige le fichier complet en mémoire :
+    # ici les blocs sont simplement accumulés. Seule la CLI (waze_export.py) écrit en flux.
+    out = io.BytesIO()
+    export_selection(load_data()[0], ville, date_tuple, scenarios_export, format_export, out)
+    return out.getvalue()
+
+_, extension_export, mime_export = EXPORT_FORMATS[format_export]
+st.sidebar.download_button(
+    label="🗂️ Télécharger les données",
+    data=export_data,
+    file_name=f"Waze_{('-'.join(ville) if isinstance(ville, list) else ville)}_{datetime.now().strftime('%Y%m%d')}.{extension_export}",
+    mime=mime_export
+)
+
 # =============================
 # TITRE + LOGOS
 # =============================
@@ -566,111 +351,13 @@ st.markdown("### 3️⃣ Visualisations")
 if len(df) == 0:
     st.warning("⚠️ Aucune donnée disponible pour les paramètres sélectionnés.")
 else:
-    # 3.1 Évolution temporelle
-    st.markdown("#### 3.1 Évolution temporelle des scénarios")
-    df_time = (
-        df.groupby([df["Date"].dt.date, "scenario"])
-        .size()
-        .reset_index(name="count")
-        .rename(columns={"Date": "date"})
-    )
-    fig = px.line(
-        df_time,
-        x="date",
-        y="count",
-        color="scenario",
-        markers=True,
-        title="📈 Tendance des incidents routiers"
-    )
-    st.plotly_chart(fig, use_container_width=True)
-
-    # 3.2 Distribution
-    st.markdown("#### 3.2 Distribution des scénarios par type")
-    dist_data = df["scenario"].value_counts().reset_index()
-    dist_data.columns = ["scenario", "count"]
-    fig = px.bar(
-        dist_data,
-        x="scenario",
-        y="count",
-        labels={"scenario": "Scénario", "count": "Nombre"},
-        color="count",
-        color_continuous_scale="Viridis",
-        title="📊 Répartition des signalements par type"
-    )
-    st.plotly_chart(fig, use_container_width=True)
-
-    # 3.3 Inondations
-    st.markdown("#### 3.3 Top 10 des rues avec inondations")
-    df_inond = df[df["scenario"] == "Inondation"]
-    if len(df_inond) > 0:
-        inond_counts = df_inond["Street"].value_counts().head(10).reset_index()
-        inond_counts.columns = ["Street", "count"]
-        fig = px.bar(inond_counts, x="Street", y="count", labels={"Street": "Rue", "count": "Nombre"},
-                     color="count", color_continuous_scale="Blues", title="🌊 Inondations par rue")
-        st.plotly_chart(fig, use_container_width=True)
-    else:
-        st.info("Aucune inondation signalée pour cette période.")
-
-    # 3.4 Nids de poule
-    st.markdown("#### 3.4 Top 10 des rues avec nids de poule")
-    df_pothole = df[df["scenario"] == "Nid-de-poule"]
-    if len(df_pothole) > 0:
-        pothole_counts = df_pothole["Street"].value_counts().head(10).reset_index()
-        pothole_counts.columns = ["Street", "count"]
-        fig = px.bar(pothole_counts, x="Street", y="count", labels={"Street": "Rue", "count": "Nombre"},
-                     color="count", color_continuous_scale="Greys", title="🕳️ Nids de poule par rue")
-        st.plotly_chart(fig, use_container_width=True)
-    else:
-        st.info("Aucun nid de poule signalé pour cette période.")
-
-    # 3.5 Accidents
-    st.markdown("#### 3.5 Top 10 des rues avec accidents")
-    df_acc = df[df["scenario"].str.contains("Accident", na=False)]
-    if len(df_acc) > 0:
-        acc_counts = df_acc["Street"].value_counts().head(10).reset_index()
-        acc_counts.columns = ["Street", "count"]
-        fig = px.bar(acc_counts, x="Street", y="count", labels={"Street": "Rue", "count": "Nombre"},
-                     color="count", color_continuous_scale="Reds", title="⚠️ Accidents par rue")
-        st.plotly_chart(fig, use_container_width=True)
-    else:
-        st.info("Aucun accident signalé pour cette période.")
-
-    # 3.6 Bouchons
-    st.markdown("#### 3.6 Top 10 des rues avec bouchons")
-    df_bouchons = df[df["scenario"].str.contains("Bouchon", na=False)]
-    if len(df_bouchons) > 0:
-        bouchons_counts = df_bouchons["Street"].value_counts().head(10).reset_index()
-        bouchons_counts.columns = ["Street", "count"]
-        fig = px.bar(bouchons_counts, x="Street", y="count", labels={"Street": "Rue", "count": "Nombre"},
-                     color="count", color_continuous_scale="Oranges", title="🚗 Bouchons par rue")
-        st.plotly_chart(fig, use_container_width=True)
-    else:
-        st.info("Aucun bouchon signalé pour cette période.")
-
-    # 3.7 Tous scénarios
-    st.markdown("#### 3.7 Top 10 des rues avec le plus de scénarios")
-    all_streets = df["Street"].value_counts().head(10).reset_index()
-    all_streets.columns = ["Street", "count"]
-    fig = px.bar(all_streets, x="Street", y="count", labels={"Street": "Rue", "count": "Nombre"},
-                 color="count", color_continuous_scale="Purples", title="📍 Rues les plus actives")
-    st.plotly_chart(fig, use_container_width=True)
-
-    # 3.8 Corrélation
-    st.markdown("#### 3.8 Matrice de corrélation des scénarios quotidiens")
-    pivot = (
-        df.groupby([df["Date"].dt.date, "scenario"])
-        .size()
-        .unstack(fill_value=0)
-    )
-    corr = pivot.corr()
-    fig = px.imshow(
-        corr,
-        text_auto=True,
-        aspect="auto",
-        color_continuous_scale="RdBu",
-        title="🔗 Corrélations entre types d'incidents"
-    )
-    st.plotly_chart(fig, use_container_width=True)
+    charts = snapshot["charts"] if snapshot is not None else build_report_charts(df)
+    for titre, fig, message in charts:
+        st.markdown(titre)
+        if fig is not None:
+            st.plotly_chart(fig, use_container_width=True)
+        else:
+            st.info(message)
 
 # =============================
 # 4. ANALYSE
@@ -725,4 +412,44 @@ else:
         use_container_width=True
     )
 
+# =============================
+# 7. ALERTES
+# =============================
+st.divider()
+st.markdown("### 7️⃣ Alertes — Pics anormaux de signalements")
+st.caption(
+    f"Un jour est signalé lorsque son nombre d'incidents dépasse la médiane des {ANOMALIE_FENETRE} "
+    f"jours précédents de plus de {ANOMALIE_SEUIL} écarts robustes (MAD, au moins √moyenne et 1). "
+    f"Seuls les couples ville × scénario ayant des signalements sur au moins "
+    f"{ANOMALIE_MIN_JOURS_ACTIFS} de ces {ANOMALIE_FENETRE} jours peuvent alerter."
+)
+
+if snapshot_index is not None:
+    alertes_all = get_cached_snapshot_alertes(snapshot_index["generated_at"])
+else:
+    alertes_all = get_cached_anomalies()
+alertes = filter_anomalies(alertes_all, ville, date_tuple)
+
+alertes_cols = {
+    "Date": "Date", "City": "Ville", "scenario": "Scénario",
+    "count": "Nombre", "mediane": "Normale", "score": "Score"
+}
+
+if len(alertes) == 0:
+    st.success("✅ Aucun pic anormal détecté pour les villes et la période sélectionnées.")
+else:
+    st.error(f"🚨 {len(alertes)} pic(s) anormal(aux) détecté(s)")
+    alertes_scenario = alertes["scenario"].value_counts().reset_index()
+    alertes_scenario.columns = ["scenario", "count"]
+    fig = px.bar(alertes_scenario, x="scenario", y="count", labels={"scenario": "Scénario", "count": "Alertes"},
+                 color="count", color_continuous_scale="Reds", title="🚨 Alertes par scénario")
+    st.plotly_chart(fig, use_container_width=True)
+    st.dataframe(alertes.rename(columns=alertes_cols), use_container_width=True, hide_index=True)
+
+with st.expander("Toutes les communes du service commun"):
+    if len(alertes_all) == 0:
+        st.info("Aucun pic anormal détecté.")
+    else:
+        st.dataframe(alertes_all.head(100).rename(columns=alertes_cols), use_container_width=True, hide_index=True)
+
 st.markdown("<p style='text-align: center; color: #888;'>📊 Rapport généré avec les données Waze</p>", unsafe_allow_html=True)
@@ -0,0 +1,52 @@
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from waze_core import ANOMALIE_FENETRE, detect_anomalies
+
+
+def _signalements(nb_jours, pic=None):
+    """Un signalement par jour et par groupe ; `pic` = (jour, ville, scénario, nombre)."""
+    jours = pd.date_range("2024-01-01", periods=nb_jours, freq="D")
+    rows = [
+        (jour, ville, scenario)
+        for jour in jours
+        for ville in ("Palaiseau", "Longjumeau")
+        for scenario in ("Inondation", "Nid-de-poule")
+    ]
+    if pic is not None:
+        jour, ville, scenario, nombre = pic
+        rows += [(jours[jour], ville, scenario)] * nombre
+    return pd.DataFrame(rows, columns=["Date", "City", "scenario"])
+
+
+def test_pic_detecte_le_bon_jour_avec_les_bons_libelles():
+    alertes = detect_anomalies(_signalements(60, pic=(45, "Longjumeau", "Inondation", 9)))
+
+    assert len(alertes) == 1
+    alerte = alertes.iloc[0]
+    assert alerte["Date"] == pd.Timestamp("2024-01-01") + pd.Timedelta(days=45)
+    assert alerte["City"] == "Longjumeau"
+    assert alerte["scenario"] == "Inondation"
+    assert alerte["count"] == 10
+    assert alerte["mediane"] == 1
+
+
+def test_aucune_alerte_sans_pic():
+    assert detect_anomalies(_signalements(60)).empty
+
+
+def test_aucune_alerte_si_historique_trop_court():
+    df = _signalements(ANOMALIE_FENETRE, pic=(ANOMALIE_FENETRE - 1, "Longjumeau", "Inondation", 9))
+    assert detect_anomalies(df).empty
+
+
+def test_serie_sans_historique_etabli_n_alerte_pas():
+    df = _signalements(60)
+    df = df[~((df["City"] == "Palaiseau") & (df["scenario"] == "Nid-de-poule"))]
+    pic = pd.DataFrame([(pd.Timestamp("2024-02-15"), "Palaiseau", "Nid-de-poule")] * 10,
+                       columns=["Date", "City", "scenario"])
+    assert detect_anomalies(pd.concat([df, pic])).empty
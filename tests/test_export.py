@@ -0,0 +1,109 @@
+import io
+import json
+import sys
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from waze_core import EXPORT_COLONNES, export_selection, selection_mask
+
+VILLES = ["Palaiseau", "Orsay"]
+PERIODE = (date(2024, 1, 2), date(2024, 1, 8))
+SCENARIOS = ["Inondation", "Accident grave"]
+
+
+def _waze():
+    """Dix jours × trois villes × trois scénarios ; une rue et une position manquantes."""
+    rows = [
+        (jour, ville, "Rue de Paris", scenario, 4, 48.7, 2.2)
+        for jour in pd.date_range("2024-01-01", periods=10, freq="D")
+        for ville in ("Palaiseau", "Orsay", "Igny")
+        for scenario in ("Inondation", "Nid-de-poule", "Accident grave")
+    ]
+    waze = pd.DataFrame(rows, columns=EXPORT_COLONNES)
+    selection = waze.index[selection_mask(waze, VILLES, PERIODE, SCENARIOS)]
+    waze.loc[selection[1], "Street"] = None
+    waze.loc[selection[4], ["latitude", "longitude"]] = None
+    return waze
+
+
+def _attendu(waze, date_tuple):
+    mask = selection_mask(waze, VILLES, date_tuple, SCENARIOS)
+    return waze[mask].reset_index(drop=True)
+
+
+def _export(waze, fmt, date_tuple=PERIODE):
+    out = io.BytesIO()
+    nb_lignes = export_selection(waze, VILLES, date_tuple, SCENARIOS, fmt, out, chunk_size=3)
+    return nb_lignes, out.getvalue()
+
+
+def test_csv_par_blocs_un_seul_entete():
+    waze = _waze()
+    attendu = _attendu(waze, PERIODE)
+    nb_lignes, data = _export(waze, "csv")
+
+    assert nb_lignes == len(attendu) > 3
+    assert data.decode("utf-8").count("Date,City") == 1
+    df = pd.read_csv(io.BytesIO(data), parse_dates=["Date"])
+    assert list(df.columns) == EXPORT_COLONNES
+    pd.testing.assert_frame_equal(df, attendu, check_dtype=False)
+
+
+def test_parquet_par_blocs():
+    pytest.importorskip("pyarrow")
+    waze = _waze()
+    attendu = _attendu(waze, PERIODE)
+    _, data = _export(waze, "parquet")
+
+    df = pd.read_parquet(io.BytesIO(data))
+    assert list(df.columns) == EXPORT_COLONNES
+    pd.testing.assert_frame_equal(df, attendu, check_dtype=False)
+
+
+def test_geojson_par_blocs_reste_valide():
+    waze = _waze()
+    attendu = _attendu(waze, PERIODE)
+    _, data = _export(waze, "geojson")
+
+    geojson = json.loads(data)
+    features = geojson["features"]
+    assert geojson["type"] == "FeatureCollection"
+    assert len(features) == len(attendu)
+    assert [f["properties"]["City"] for f in features] == attendu["City"].tolist()
+    assert [f["properties"]["scenario"] for f in features] == attendu["scenario"].tolist()
+    assert all(f["properties"]["Date"] <= "2024-01-08" for f in features)
+    assert features[0]["geometry"] == {"type": "Point", "coordinates": [2.2, 48.7]}
+    assert features[1]["properties"]["Street"] is None
+    assert features[4]["geometry"] is None
+
+
+def test_filtres_identiques_a_selection_mask():
+    waze = _waze()
+    attendu = _attendu(waze, PERIODE)
+
+    assert set(attendu["City"]) == set(VILLES)
+    assert set(attendu["scenario"]) == set(SCENARIOS)
+    assert attendu["Date"].dt.date.between(*PERIODE).all()
+    _, data = _export(waze, "csv")
+    assert len(pd.read_csv(io.BytesIO(data))) == len(attendu)
+
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet", "geojson"])
+def test_selection_vide_produit_un_fichier_valide(fmt):
+    if fmt == "parquet":
+        pytest.importorskip("pyarrow")
+    nb_lignes, data = _export(_waze(), fmt, date_tuple=(date(2030, 1, 1), date(2030, 1, 2)))
+
+    assert nb_lignes == 0
+    if fmt == "csv":
+        assert list(pd.read_csv(io.BytesIO(data)).columns) == EXPORT_COLONNES
+    elif fmt == "parquet":
+        df = pd.read_parquet(io.BytesIO(data))
+        assert df.empty and list(df.columns) == EXPORT_COLONNES
+    else:
+        assert json.loads(data) == {"type": "FeatureCollection", "features": []}
@@ -0,0 +1,677 @@
+"""
+Logique métier du rapport Waze, sans dépendance à Streamlit.
+
+Partagée par le dashboard (`dashboard_waze.py`) et les traitements
+hors ligne (`waze_snapshots.py`).
+"""
+import re
+import io
+import sys
+import json
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+import numpy as np
+import plotly.express as px
+from fpdf import FPDF
+from fpdf.enums import XPos, YPos
+
+BASE_DIR = Path(__file__).resolve().parent
+
+# =============================
+# LOGGING
+# =============================
+logging.getLogger('fpdf').setLevel(logging.ERROR)
+
+# =============================
+# ICONES
+# =============================
+# Icônes locales (répertoire icones/), une par scénario : aucune requête
+# externe, la carte fonctionne hors ligne.
+ICONES = {
+    "Bouchon – trafic dense": "icones/bouchon-trafic-dense.svg",
+    "Bouchon – trafic à l’arrêt": "icones/bouchon-trafic-arret.svg",
+    "Accident léger": "icones/accident-leger.svg",
+    "Accident grave": "icones/accident-grave.svg",
+    "Nid-de-poule": "icones/nid-de-poule.svg",
+    "Panne de feu tricolore": "icones/panne-feu-tricolore.svg",
+    "Inondation": "icones/inondation.svg"
+}
+
+# =============================
+# GRAVITÉ DES SCÉNARIOS
+# =============================
+GRAVITE = {
+    "Accident grave": 5,
+    "Inondation": 4,
+    "Bouchon – trafic à l'arrêt": 3,
+    "Accident léger": 3,
+    "Bouchon – trafic dense": 2,
+    "Panne de feu tricolore": 2,
+    "Nid-de-poule": 1
+}
+
+# =============================
+# DÉTECTION D'ANOMALIES
+# =============================
+ANOMALIE_FENETRE = 28             # jours d'historique pour la normale glissante
+ANOMALIE_SEUIL = 3.5              # score robuste (médiane/MAD) à partir duquel on alerte
+ANOMALIE_MIN_JOURS_ACTIFS = 7     # jours avec signalement requis dans la fenêtre (historique établi)
+
+# =============================
+# VILLES AUTORISÉES
+# =============================
+VILLES_SERVICE_COMMUN = [
+    "Palaiseau", "Orsay", "Villejust", "Ballainvilliers",
+    "Verrières-le-Buisson", "La Ville-du-Bois", "Les Ulis",
+    "Saclay", "Wissous", "Villebon-sur-Yvette",
+    "Saulx-les-Chartreux", "Villiers-le-Bâcle", "Linas",
+    "Vauhallan", "Saint-Aubin", "Longjumeau",
+    "Marcoussis", "Nozay", "Epinay-sur-Orge", "Igny"
+]
+
+# =============================
+# MAPPING FICHIERS → SCÉNARIOS
+# =============================
+FILES = {
+    "Waze heavy traffic.csv": "Bouchon – trafic dense",
+    "Waze stand still traffic.csv": "Bouchon – trafic à l’arrêt",
+    "Waze accident minor.csv": "Accident léger",
+    "Waze accident major.csv": "Accident grave",
+    "Waze pot_hole.csv": "Nid-de-poule",
+    "HAZARD_ON_ROAD_TRAFFIC_LIGHT_FAULT.csv": "Panne de feu tricolore",
+    "HAZARD_WEATHER_FLOOD.csv": "Inondation"
+}
+
+# =============================
+# HELPERS
+# =============================
+def _parse_location_column(df, location_col="Location"):
+    """
+    Remplit df['latitude'] et df['longitude'] à partir de la colonne Location
+    (formats acceptés: 'POINT(lon lat)' ou 'lat,lon' / 'lon,lat').
+    """
+    if location_col not in df.columns:
+        return df
+
+    def _extract_lat_lon(val):
+        if pd.isna(val):
+            return (None, None)
+        s = str(val)
+
+        # WKT: POINT(lon lat)
+        m = re.search(r"POINT\s*\(\s*([-+]?\d*\.?\d+)[\s,]+([-+]?\d*\.?\d+)\s*\)", s, re.IGNORECASE)
+        if m:
+            try:
+                lon = float(m.group(1))
+                lat = float(m.group(2))
+                return (lat, lon)
+            except Exception:
+                return (None, None)
+
+        # fallback: "a b" ou "a,b" (essaie de déduire lat/lon)
+        m2 = re.search(r"([-+]?\d*\.?\d+)[\s,;]+([-+]?\d*\.?\d+)", s)
+        if m2:
+            a = float(m2.group(1)); b = float(m2.group(2))
+            # heuristique: lat FR ~ [40, 60]
+            if 40 <= a <= 60:
+                return (a, b)
+            if 40 <= b <= 60:
+                return (b, a)
+            # par défaut: (a, b) comme (lat, lon)
+            return (a, b)
+        return (None, None)
+
+    lats, lons = [], []
+    for v in df[location_col]:
+        lat, lon = _extract_lat_lon(v)
+        lats.append(lat)
+        lons.append(lon)
+
+    df = df.copy()
+    df["latitude"] = pd.to_numeric(pd.Series(lats), errors="coerce")
+    df["longitude"] = pd.to_numeric(pd.Series(lons), errors="coerce")
+    return df
+
+# =============================
+# CHARGEMENT DES DONNÉES
+# =============================
+def load_waze_data(base_dir=BASE_DIR):
+    """Charge les CSV Waze ; renvoie (DataFrame filtré, fichiers absents)."""
+    base_dir = Path(base_dir)
+    dfs = []
+    missing = []
+
+    for file_name, scenario in FILES.items():
+        path = base_dir / file_name
+        if not path.exists():
+            missing.append(file_name)
+            continue
+
+        df = pd.read_csv(path, low_memory=False)
+
+        # Normalisation colonnes
+        if "City" not in df.columns:
+            df["City"] = "Inconnue"
+        else:
+            df["City"] = df["City"].fillna("Inconnue")
+
+        if "Street" not in df.columns:
+            df["Street"] = ""
+
+        if "Date" in df.columns:
+            df["Date"] = pd.to_datetime(df["Date"], errors="coerce", dayfirst=True)
+        else:
+            df["Date"] = pd.NaT
+
+        # Extraire lat/lon
+        df = _parse_location_column(df, "Location")
+
+        # Scénario (depuis le nom du fichier)
+        df["scenario"] = scenario
+
+        dfs.append(df)
+
+    if not dfs:
+        raise FileNotFoundError("Aucun CSV valide trouvé.")
+
+    # Concat
+    waze = pd.concat(dfs, ignore_index=True)
+    waze["City"] = waze["City"].fillna("Inconnue")
+
+    # Filtre service commun
+    waze_filtered = waze[waze["City"].isin(VILLES_SERVICE_COMMUN)].copy()
+    # Gravité
+    waze_filtered["gravite"] = waze_filtered["scenario"].map(GRAVITE).fillna(1).astype(int)
+
+    return waze_filtered, missing
+
+def data_signature(base_dir=BASE_DIR):
+    """Empreinte des CSV sources (nom, taille, date de modification)."""
+    h = hashlib.sha1()
+    for file_name in FILES:
+        path = Path(base_dir) / file_name
+        if path.exists():
+            stat = path.stat()
+            h.update(f"{file_name}:{stat.st_size}:{stat.st_mtime_ns};".encode("utf-8"))
+    return h.hexdigest()
+
+def selection_mask(waze, ville, date_tuple, scenarios=None):
+    """Masque du filtre ville(s) + plage de dates (+ scénarios) de la barre latérale."""
+    date_min, date_max = date_tuple
+    villes = ville if isinstance(ville, list) else [ville]
+    dates = waze["Date"].dt.date
+    mask = waze["City"].isin(villes) & (dates >= date_min) & (dates <= date_max)
+    if scenarios is not None:
+        mask &= waze["scenario"].isin(scenarios)
+    return mask
+
+def filter_waze(waze, ville, date_tuple):
+    """Applique le filtre ville(s) + plage de dates de la barre latérale."""
+    return waze[selection_mask(waze, ville, date_tuple)].copy()
+
+# =============================
+# PÉRIODES STANDARD
+# =============================
+PERIODES_STANDARD = {
+    "Toute la période": None,
+    "7 derniers jours": 7,
+    "30 derniers jours": 30,
+    "365 derniers jours": 365
+}
+
+def periode_dates(periode, date_min, date_max):
+    """Bornes (début, fin) d'une période standard, terminée au dernier jour de données."""
+    nb_jours = PERIODES_STANDARD[periode]
+    if nb_jours is None:
+        return (date_min, date_max)
+    return (max(date_min, date_max - timedelta(days=nb_jours - 1)), date_max)
+
+# =============================
+# ALERTES (ANOMALIES)
+# =============================
+def detect_anomalies(df, fenetre=ANOMALIE_FENETRE, seuil=ANOMALIE_SEUIL,
+                     min_jours_actifs=ANOMALIE_MIN_JOURS_ACTIFS):
+    """
+    Détecte les pics de signalements quotidiens pour chaque couple ville × scénario.
+
+    Les comptes journaliers sont pivotés en une matrice jours × (ville, scénario),
+    puis chaque jour est comparé à la médiane des `fenetre` jours précédents.
+    L'écart est normalisé par la MAD (score robuste), avec un plancher de type
+    Poisson (racine de la moyenne de la fenêtre, au moins 1) pour les séries
+    creuses. Seules les séries ayant au moins `min_jours_actifs` jours avec
+    signalement dans la fenêtre peuvent alerter : sans historique établi, un
+    jour isolé ne constitue pas une anomalie. Tous les groupes sont traités en
+    une seule passe numpy, sans boucle Python par groupe.
+    """
+    aucune_alerte = pd.DataFrame({
+        "Date": pd.Series(dtype="datetime64[ns]"), "City": pd.Series(dtype=object),
+        "scenario": pd.Series(dtype=object), "count": pd.Series(dtype=int),
+        "mediane": pd.Series(dtype=float), "score": pd.Series(dtype=float)
+    })
+    df = df.dropna(subset=["Date"])
+    if df.empty:
+        return aucune_alerte
+
+    jours = df["Date"].dt.normalize()
+    counts = (
+        df.groupby([jours, "City", "scenario"])
+        .size()
+        .unstack(["City", "scenario"], fill_value=0)
+    )
+    counts = counts.reindex(pd.date_range(counts.index.min(), counts.index.max(), freq="D"), fill_value=0)
+    if len(counts) <= fenetre:
+        return aucune_alerte
+
+    values = counts.to_numpy(dtype=float)
+    # Fenêtre i = jours [i, i + fenetre[, comparée au jour i + fenetre
+    windows = np.lib.stride_tricks.sliding_window_view(values[:-1], fenetre, axis=0)
+    mediane = np.median(windows, axis=-1)
+    mad = np.median(np.abs(windows - mediane[..., None]), axis=-1)
+    # Plancher Poisson : une série de moyenne λ a un écart-type ≈ √λ
+    echelle = np.maximum(1.4826 * mad, np.sqrt(np.maximum(windows.mean(axis=-1), 1.0)))
+    jours_actifs = (windows > 0).sum(axis=-1)
+    courant = values[fenetre:]
+    score = (courant - mediane) / echelle
+
+    jours_idx, groupes_idx = np.nonzero((score >= seuil) & (jours_actifs >= min_jours_actifs))
+    alertes = pd.DataFrame({
+        "Date": counts.index[fenetre:][jours_idx],
+        "City": counts.columns.get_level_values("City")[groupes_idx],
+        "scenario": counts.columns.get_level_values("scenario")[groupes_idx],
+        "count": courant[jours_idx, groupes_idx].astype(int),
+        "mediane": mediane[jours_idx, groupes_idx],
+        "score": score[jours_idx, groupes_idx].round(1),
+    })
+    return alertes.sort_values(["Date", "score"], ascending=[False, False]).reset_index(drop=True)
+
+def filter_anomalies(alertes, ville, date_tuple):
+    date_min, date_max = date_tuple
+    villes = ville if isinstance(ville, list) else [ville]
+    mask = (
+        alertes["City"].isin(villes)
+        & (alertes["Date"].dt.date >= date_min)
+        & (alertes["Date"].dt.date <= date_max)
+    )
+    return alertes[mask]
+
+# =============================
+# EXPORT DES DONNÉES
+# =============================
+EXPORT_COLONNES = ["Date", "City", "Street", "scenario", "gravite", "latitude", "longitude"]
+EXPORT_CHUNK = 5000
+
+# format -> (libellé, extension, type MIME)
+EXPORT_FORMATS = {
+    "csv": ("CSV", "csv", "text/csv"),
+    "parquet": ("Parquet", "parquet", "application/vnd.apache.parquet"),
+    "geojson": ("GeoJSON", "geojson", "application/geo+json")
+}
+
+def _iter_chunks(waze, mask, chunk_size):
+    positions = np.flatnonzero(mask.to_numpy())
+    for start in range(0, len(positions), chunk_size):
+        yield waze.iloc[positions[start:start + chunk_size]][EXPORT_COLONNES]
+
+def _write_csv(chunks, out):
+    header = True
+    for chunk in chunks:
+        out.write(chunk.to_csv(index=False, header=header, date_format="%Y-%m-%d").encode("utf-8"))
+        header = False
+    if header:
+        out.write((",".join(EXPORT_COLONNES) + "\n").encode("utf-8"))
+
+def _write_parquet(chunks, out):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("Date", pa.timestamp("ns")), ("City", pa.string()), ("Street", pa.string()),
+        ("scenario", pa.string()), ("gravite", pa.int64()),
+        ("latitude", pa.float64()), ("longitude", pa.float64())
+    ])
+    with pq.ParquetWriter(out, schema) as writer:
+        for chunk in chunks:
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+def _write_geojson(chunks, out):
+    out.write(b'{"type": "FeatureCollection", "features": [\n')
+    first = True
+    for chunk in chunks:
+        features = []
+        for date, city, street, scenario, gravite, lat, lon in zip(
+            chunk["Date"].dt.strftime("%Y-%m-%d"), chunk["City"], chunk["Street"], chunk["scenario"],
+            chunk["gravite"].tolist(), chunk["latitude"].tolist(), chunk["longitude"].tolist()
+        ):
+            geometry = None if pd.isna(lat) or pd.isna(lon) else {"type": "Point", "coordinates": [lon, lat]}
+            features.append(json.dumps({
+                "type": "Feature",
+                "geometry": geometry,
+                "properties": {
+                    "Date": None if pd.isna(date) else date,
+                    "City": city,
+                    "Street": None if pd.isna(street) else street,
+                    "scenario": scenario,
+                    "gravite": gravite
+                }
+            }, ensure_ascii=False))
+        if features:
+            out.write((("" if first else ",\n") + ",\n".join(features)).encode("utf-8"))
+            first = False
+    out.write(b"\n]}\n")
+
+def export_selection(waze, ville, date_tuple, scenarios, fmt, out, chunk_size=EXPORT_CHUNK):
+    """
+    Écrit la sélection dans le fichier binaire `out`, par blocs de `chunk_size` lignes.
+
+    Le fichier n'est jamais construit en entier en mémoire : chaque bloc est
+    sérialisé puis écrit avant de passer au suivant. Renvoie le nombre de lignes.
+    """
+    writers = {"csv": _write_csv, "parquet": _write_parquet, "geojson": _write_geojson}
+    if fmt not in writers:
+        raise ValueError(f"Format d'export inconnu : {fmt}")
+    mask = selection_mask(waze, ville, date_tuple, scenarios)
+    writers[fmt](_iter_chunks(waze, mask, chunk_size), out)
+    return int(mask.sum())
+
+# =============================
+# GRAPHIQUES DU RAPPORT
+# =============================
+def _top_rues_chart(df_scenario, color_scale, title):
+    counts = df_scenario["Street"].value_counts().head(10).reset_index()
+    counts.columns = ["Street", "count"]
+    return px.bar(counts, x="Street", y="count", labels={"Street": "Rue", "count": "Nombre"},
+                  color="count", color_continuous_scale=color_scale, title=title)
+
+def build_report_charts(df):
+    """
+    Construit les graphiques de la section 3 du rapport.
+
+    Renvoie une liste de (titre, figure, message) ; la figure vaut None lorsque
+    la sélection ne contient aucun signalement du type concerné.
+    """
+    charts = []
+
+    # 3.1 Évolution temporelle
+    df_time = (
+        df.groupby([df["Date"].dt.date, "scenario"])
+        .size()
+        .reset_index(name="count")
+        .rename(columns={"Date": "date"})
+    )
+    fig = px.line(
+        df_time,
+        x="date",
+        y="count",
+        color="scenario",
+        markers=True,
+        title="📈 Tendance des incidents routiers"
+    )
+    charts.append(("#### 3.1 Évolution temporelle des scénarios", fig, None))
+
+    # 3.2 Distribution
+    dist_data = df["scenario"].value_counts().reset_index()
+    dist_data.columns = ["scenario", "count"]
+    fig = px.bar(
+        dist_data,
+        x="scenario",
+        y="count",
+        labels={"scenario": "Scénario", "count": "Nombre"},
+        color="count",
+        color_continuous_scale="Viridis",
+        title="📊 Répartition des signalements par type"
+    )
+    charts.append(("#### 3.2 Distribution des scénarios par type", fig, None))
+
+    # 3.3 à 3.6 Top rues par type
+    top_rues = [
+        ("#### 3.3 Top 10 des rues avec inondations", df["scenario"] == "Inondation",
+         "Blues", "🌊 Inondations par rue", "Aucune inondation signalée pour cette période."),
+        ("#### 3.4 Top 10 des rues avec nids de poule", df["scenario"] == "Nid-de-poule",
+         "Greys", "🕳️ Nids de poule par rue", "Aucun nid de poule signalé pour cette période."),
+        ("#### 3.5 Top 10 des rues avec accidents", df["scenario"].str.contains("Accident", na=False),
+         "Reds", "⚠️ Accidents par rue", "Aucun accident signalé pour cette période."),
+        ("#### 3.6 Top 10 des rues avec bouchons", df["scenario"].str.contains("Bouchon", na=False),
+         "Oranges", "🚗 Bouchons par rue", "Aucun bouchon signalé pour cette période."),
+    ]
+    for titre, mask, color_scale, fig_title, message in top_rues:
+        df_scenario = df[mask]
+        if len(df_scenario) > 0:
+            charts.append((titre, _top_rues_chart(df_scenario, color_scale, fig_title), None))
+        else:
+            charts.append((titre, None, message))
+
+    # 3.7 Tous scénarios
+    charts.append((
+        "#### 3.7 Top 10 des rues avec le plus de scénarios",
+        _top_rues_chart(df, "Purples", "📍 Rues les plus actives"),
+        None
+    ))
+
+    # 3.8 Corrélation
+    pivot = (
+        df.groupby([df["Date"].dt.date, "scenario"])
+        .size()
+        .unstack(fill_value=0)
+    )
+    corr = pivot.corr()
+    fig = px.imshow(
+        corr,
+        text_auto=True,
+        aspect="auto",
+        color_continuous_scale="RdBu",
+        title="🔗 Corrélations entre types d'incidents"
+    )
+    charts.append(("#### 3.8 Matrice de corrélation des scénarios quotidiens", fig, None))
+
+    return charts
+
+# =============================
+# FONCTIONS PDF
+# =============================
+def _generate_pdf_report(ville, df, alertes=None):
+    """Internal PDF generation function without caching"""
+    old_stdout = sys.stdout
+    sys.stdout = io.StringIO()
+    try:
+        pdf = FPDF()
+        pdf.add_page()
+
+        color_header = (52, 152, 219)  # Bleu
+        color_light = (236, 240, 241)  # Gris clair
+        color_text = (44, 62, 80)      # Gris foncé
+
+        # En-tête
+        pdf.set_fill_color(*color_header)
+        pdf.set_text_color(255, 255, 255)
+        pdf.set_font("helvetica", "B", 22)
+        clean_ville = ville.encode('ascii', 'ignore').decode('ascii')
+        pdf.cell(0, 20, "RAPPORT WAZE", new_x=XPos.LMARGIN, new_y=YPos.NEXT, fill=True)
+        pdf.set_font("helvetica", "", 14)
+        pdf.cell(0, 12, f"{clean_ville}", new_x=XPos.LMARGIN, new_y=YPos.NEXT, fill=True)
+        pdf.ln(5)
+
+        # Infos rapport
+        pdf.set_text_color(*color_text)
+        pdf.set_font("helvetica", "", 10)
+        rapport_date = datetime.now().strftime('%d/%m/%Y à %H:%M')
+        pdf.cell(0, 8, f"Rapport généré le: {rapport_date}", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+
+        if len(df) > 0:
+            date_min = df['Date'].min().date()
+            date_max = df['Date'].max().date()
+            pdf.cell(0, 8, f"Période analysée: {date_min} au {date_max}", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+        pdf.ln(3)
+
+        # 1. Résumé
+        pdf.set_fill_color(*color_light)
+        pdf.set_font("helvetica", "B", 12)
+        pdf.cell(0, 10, "1. RESUME STATISTIQUE", new_x=XPos.LMARGIN, new_y=YPos.NEXT, fill=True)
+        pdf.ln(2)
+
+        pdf.set_font("helvetica", "", 10)
+        total_alerts = len(df)
+        pdf.cell(0, 8, f"Total de signalements: {total_alerts}", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+
+        if len(df) > 0:
+            avg_per_day = total_alerts / ((df['Date'].max() - df['Date'].min()).days + 1)
+            pdf.cell(0, 8, f"Moyenne par jour: {avg_per_day:.1f}", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+
+        pdf.ln(5)
+
+        # 2. Répartition par scénario
+        pdf.set_fill_color(*color_light)
+        pdf.set_font("helvetica", "B", 12)
+        pdf.cell(0, 10, "2. REPARTITION PAR SCENARIO", new_x=XPos.LMARGIN, new_y=YPos.NEXT, fill=True)
+        pdf.ln(2)
+
+        pdf.set_font("helvetica", "B", 9)
+        pdf.set_fill_color(*color_header)
+        pdf.set_text_color(255, 255, 255)
+        pdf.cell(130, 8, "Scénario", border=1, fill=True)
+        pdf.cell(50, 8, "Nombre", border=1, new_x=XPos.LMARGIN, new_y=YPos.NEXT, fill=True, align="C")
+
+        pdf.set_text_color(*color_text)
+        pdf.set_font("helvetica", "", 9)
+        pdf.set_fill_color(245, 245, 245)
+
+        scenario_counts = df["scenario"].value_counts().sort_values(ascending=False)
+        fill = False
+        for scenario, count in scenario_counts.items():
+            clean_scenario = scenario.encode('ascii', 'ignore').decode('ascii')
+            percentage = (count / total_alerts * 100) if total_alerts > 0 else 0
+
+            pdf.set_fill_color(245, 245, 245) if fill else pdf.set_fill_color(255, 255, 255)
+            pdf.cell(130, 7, clean_scenario, border=1, fill=fill)
+            pdf.cell(50, 7, f"{count} ({percentage:.1f}%)", border=1, new_x=XPos.LMARGIN, new_y=YPos.NEXT, fill=fill, align="C")
+            fill = not fill
+
+        pdf.ln(5)
+
+        # 3. Top rues
+        pdf.set_font("helvetica", "B", 12)
+        pdf.cell(0, 10, "3. TOP 10 RUES LES PLUS ACTIVES", new_x=XPos.LMARGIN, new_y=YPos.NEXT, fill=True)
+        pdf.ln(2)
+
+        pdf.set_font("helvetica", "B", 9)
+        pdf.set_fill_color(*color_header)
+        pdf.set_text_color(255, 255, 255)
+        pdf.cell(130, 8, "Rue", border=1, fill=True)
+        pdf.cell(50, 8, "Signalements", border=1, new_x=XPos.LMARGIN, new_y=YPos.NEXT, fill=True, align="C")
+
+        pdf.set_text_color(*color_text)
+        pdf.set_font("helvetica", "", 8)
+        top_streets = df["Street"].value_counts().head(10)
+        fill = False
+        for street, count in top_streets.items():
+            clean_street = str(street).encode('ascii', 'ignore').decode('ascii')[:50]
+            pdf.set_fill_color(245, 245, 245) if fill else pdf.set_fill_color(255, 255, 255)
+            pdf.cell(130, 7, clean_street, border=1, fill=fill)
+            pdf.cell(50, 7, f"{count}", border=1, new_x=XPos.LMARGIN, new_y=YPos.NEXT, fill=fill, align="C")
+            fill = not fill
+
+        pdf.ln(5)
+
+        # 4. Analyse détaillée par type
+        pdf.set_fill_color(*color_light)
+        pdf.set_font("helvetica", "B", 12)
+        pdf.cell(0, 10, "4. ANALYSE DETAILLEE PAR TYPE", new_x=XPos.LMARGIN, new_y=YPos.NEXT, fill=True)
+        pdf.ln(3)
+
+        pdf.set_font("helvetica", "", 9)
+        scenarios_to_analyze = [
+            ("Accident", "Accidents"),
+            ("Inondation", "Inondations"),
+            ("Bouchon", "Bouchons")
+        ]
+
+        for keyword, label in scenarios_to_analyze:
+            df_filtered = df[df["scenario"].str.contains(keyword, na=False)]
+            if len(df_filtered) > 0:
+                pdf.set_font("helvetica", "B", 10)
+                pdf.cell(0, 8, f"{label}: {len(df_filtered)} signalements", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+
+                top_streets_scenario = df_filtered["Street"].value_counts().head(5)
+                pdf.set_font("helvetica", "", 8)
+                for street, count in top_streets_scenario.items():
+                    clean_street = str(street).encode('ascii', 'ignore').decode('ascii')[:60]
+                    pdf.cell(0, 6, f"   - {clean_street}: {count}", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+                pdf.ln(2)
+
+        # 5. Alertes
+        pdf.add_page()
+        pdf.set_fill_color(*color_light)
+        pdf.set_font("helvetica", "B", 12)
+        pdf.cell(0, 10, "5. ALERTES - PICS ANORMAUX", new_x=XPos.LMARGIN, new_y=YPos.NEXT, fill=True)
+        pdf.ln(2)
+
+        if alertes is None or len(alertes) == 0:
+            pdf.set_font("helvetica", "", 10)
+            pdf.cell(0, 8, "Aucun pic anormal détecté sur la période.", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+        else:
+            pdf.set_font("helvetica", "B", 9)
+            pdf.set_fill_color(*color_header)
+            pdf.set_text_color(255, 255, 255)
+            pdf.cell(25, 8, "Date", border=1, fill=True)
+            pdf.cell(45, 8, "Ville", border=1, fill=True)
+            pdf.cell(60, 8, "Scénario", border=1, fill=True)
+            pdf.cell(20, 8, "Nombre", border=1, fill=True, align="C")
+            pdf.cell(15, 8, "Normale", border=1, fill=True, align="C")
+            pdf.cell(15, 8, "Score", border=1, new_x=XPos.LMARGIN, new_y=YPos.NEXT, fill=True, align="C")
+
+            pdf.set_text_color(*color_text)
+            pdf.set_font("helvetica", "", 8)
+            fill = False
+            for _, row in alertes.head(20).iterrows():
+                clean_city = str(row["City"]).encode('ascii', 'ignore').decode('ascii')[:25]
+                clean_scenario = str(row["scenario"]).encode('ascii', 'ignore').decode('ascii')[:35]
+                pdf.set_fill_color(245, 245, 245) if fill else pdf.set_fill_color(255, 255, 255)
+                pdf.cell(25, 7, row["Date"].strftime('%d/%m/%Y'), border=1, fill=fill)
+                pdf.cell(45, 7, clean_city, border=1, fill=fill)
+                pdf.cell(60, 7, clean_scenario, border=1, fill=fill)
+                pdf.cell(20, 7, f"{row['count']}", border=1, fill=fill, align="C")
+                pdf.cell(15, 7, f"{row['mediane']:.0f}", border=1, fill=fill, align="C")
+                pdf.cell(15, 7, f"{row['score']:.1f}", border=1, new_x=XPos.LMARGIN, new_y=YPos.NEXT, fill=fill, align="C")
+                fill = not fill
+
+        pdf.ln(5)
+
+        # 6. Conclusion
+        pdf.set_fill_color(*color_light)
+        pdf.set_font("helvetica", "B", 12)
+        pdf.cell(0, 10, "6. CONCLUSION", new_x=XPos.LMARGIN, new_y=YPos.NEXT, fill=True)
+        pdf.ln(3)
+
+        pdf.set_font("helvetica", "", 10)
+        conclusion_text = (
+            "Ce rapport d'activité Waze fournit une analyse détaillée des incidents routiers "
+            "et des événements signalés. Les données collectées permettent d'identifier les "
+            "zones et types d'événements prioritaires pour orienter les actions de prévention "
+            "et de gestion du trafic."
+        )
+        pdf.multi_cell(0, 5, conclusion_text)
+        pdf.ln(5)
+
+        pdf.set_font("helvetica", "", 8)
+        pdf.set_text_color(150, 150, 150)
+        pdf.cell(0, 10, "Rapport généré automatiquement - Données Waze",
+                 new_x=XPos.LMARGIN, new_y=YPos.NEXT, align="C")
+
+        return bytes(pdf.output())
+    finally:
+        sys.stdout = old_stdout
+
+def generate_pdf_report(ville, df, alertes=None):
+    old_stdout = sys.stdout
+    old_stderr = sys.stderr
+    try:
+        sys.stdout = io.StringIO()
+        sys.stderr = io.StringIO()
+        result = _generate_pdf_report(ville, df, alertes)
+        return result
+    finally:
+        sys.stdout = old_stdout
+        sys.stderr = old_stderr
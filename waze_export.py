@@ -0,0 +1,54 @@
+"""
+Export des signalements Waze filtrés (CSV, Parquet ou GeoJSON).
+
+Mêmes filtres que la barre latérale du dashboard : communes, plage de dates
+et scénarios. Le fichier est écrit par blocs, sans être construit en mémoire.
+
+Exemples :
+
+    python waze_export.py inondations.geojson --ville Longjumeau --scenario Inondation
+    python waze_export.py palaiseau_2024.csv --ville Palaiseau --debut 2024-01-01 --fin 2024-12-31
+"""
+import argparse
+import sys
+from datetime import date
+from pathlib import Path
+
+from waze_core import (
+    EXPORT_CHUNK, EXPORT_FORMATS, FILES, VILLES_SERVICE_COMMUN, export_selection, load_waze_data
+)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporte les signalements Waze filtrés.")
+    parser.add_argument("sortie", type=Path, help="Fichier de sortie (.csv, .parquet ou .geojson)")
+    parser.add_argument("--format", choices=list(EXPORT_FORMATS), help="Format (déduit de l'extension par défaut)")
+    parser.add_argument("--ville", action="append", dest="villes", choices=VILLES_SERVICE_COMMUN,
+                        metavar="VILLE", help="Commune du service commun (répétable, toutes par défaut)")
+    parser.add_argument("--debut", type=date.fromisoformat, help="Date de début AAAA-MM-JJ (incluse)")
+    parser.add_argument("--fin", type=date.fromisoformat, help="Date de fin AAAA-MM-JJ (incluse)")
+    parser.add_argument("--scenario", action="append", dest="scenarios", choices=list(FILES.values()),
+                        metavar="SCENARIO", help=f"Scénario parmi : {', '.join(FILES.values())} (répétable, tous par défaut)")
+    parser.add_argument("--taille-bloc", type=int, default=EXPORT_CHUNK, help="Lignes écrites par bloc")
+    args = parser.parse_args(argv)
+
+    if args.taille_bloc <= 0:
+        parser.error("--taille-bloc doit être strictement positif")
+
+    fmt = args.format or args.sortie.suffix.lstrip(".").lower()
+    if fmt not in EXPORT_FORMATS:
+        parser.error(f"format inconnu « {fmt} » : utiliser --format {{{','.join(EXPORT_FORMATS)}}}")
+
+    waze, missing = load_waze_data()
+    if missing:
+        print(f"Fichiers absents : {', '.join(missing)}", file=sys.stderr)
+
+    villes = args.villes or sorted(waze["City"].unique())
+    date_tuple = (args.debut or waze["Date"].min().date(), args.fin or waze["Date"].max().date())
+
+    with open(args.sortie, "wb") as out:
+        nb_lignes = export_selection(waze, villes, date_tuple, args.scenarios, fmt, out, args.taille_bloc)
+    print(f"{nb_lignes} signalements exportés dans {args.sortie} ({EXPORT_FORMATS[fmt][0]})")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+"""
+Pré-calcul nocturne des rapports Waze.
+
+Pour chaque commune et chaque période standard (7, 30, 365 derniers jours et
+toute la période), génère les données filtrées, les graphiques et le PDF dans
+un répertoire local. Le dashboard sert ces instantanés dès que la sélection
+correspond, et recalcule en direct sinon.
+
+Exemple de tâche planifiée (cron, tous les jours à 3h) :
+
+    0 3 * * * cd /chemin/vers/Waze && python waze_snapshots.py
+"""
+import argparse
+import hashlib
+import json
+import shutil
+import sys
+from datetime import date, datetime
+from pathlib import Path
+
+import pandas as pd
+import plotly.io as pio
+
+from waze_core import (
+    BASE_DIR, PERIODES_STANDARD, VILLES_SERVICE_COMMUN, build_report_charts, data_signature,
+    detect_anomalies, filter_anomalies, filter_waze, generate_pdf_report, load_waze_data, periode_dates
+)
+
+SNAPSHOT_DIR = BASE_DIR / "snapshots"
+
+def code_version():
+    """
+    Empreinte du code qui produit les instantanés (rapport, graphiques, seuils
+    d'alerte, filtres) : toute modification invalide le magasin existant.
+    """
+    h = hashlib.sha1()
+    for module in (Path(__file__).resolve(), BASE_DIR / "waze_core.py"):
+        h.update(module.read_bytes())
+    return h.hexdigest()
+
+# =============================
+# GÉNÉRATION
+# =============================
+def _periode_slug(periode):
+    nb_jours = PERIODES_STANDARD[periode]
+    return "tout" if nb_jours is None else f"{nb_jours}j"
+
+def _snapshot_key(ville, date_tuple):
+    return f"{ville}|{date_tuple[0].isoformat()}|{date_tuple[1].isoformat()}"
+
+def _write_snapshot(path, ville, df, alertes, charts):
+    path.mkdir(parents=True, exist_ok=True)
+    df.to_pickle(path / "donnees.pkl")
+    (path / "rapport.pdf").write_bytes(generate_pdf_report(ville, df, alertes))
+    charts_json = [
+        {"titre": titre, "fig": fig.to_json() if fig is not None else None, "message": message}
+        for titre, fig, message in charts
+    ]
+    (path / "graphiques.json").write_text(json.dumps(charts_json), encoding="utf-8")
+
+def build_snapshots(store=SNAPSHOT_DIR, base_dir=BASE_DIR, villes=None):
+    """
+    Reconstruit les instantanés de `villes` (toutes par défaut) dans `store`.
+
+    Le nouveau jeu est écrit dans un répertoire temporaire puis substitué à
+    l'ancien, afin que le dashboard ne lise jamais un magasin à moitié écrit.
+    Lors d'une reconstruction partielle, les instantanés des autres communes
+    sont repris du magasin existant s'il est encore valide (mêmes CSV, même code).
+    """
+    store = Path(store)
+    signature = data_signature(base_dir)
+    waze, missing = load_waze_data(base_dir)
+    alertes_all = detect_anomalies(waze)
+
+    date_min = waze["Date"].min().date()
+    date_max = waze["Date"].max().date()
+    villes_disponibles = sorted(waze["City"].unique())
+
+    tmp = store.with_name(store.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    alertes_all.to_pickle(tmp / "alertes.pkl")
+
+    villes = villes or villes_disponibles
+    entries = {}
+    existant = load_index(store, base_dir)
+    if existant is not None:
+        for key, rel_path in existant["entries"].items():
+            ville = key.split("|", 1)[0]
+            if ville not in villes and (store / rel_path).exists():
+                shutil.copytree(store / rel_path, tmp / rel_path)
+                entries[key] = rel_path
+
+    for ville in villes:
+        for periode in PERIODES_STANDARD:
+            date_tuple = periode_dates(periode, date_min, date_max)
+            df = filter_waze(waze, ville, date_tuple)
+            alertes = filter_anomalies(alertes_all, ville, date_tuple)
+            charts = build_report_charts(df) if len(df) > 0 else []
+            rel_path = Path(ville) / _periode_slug(periode)
+            _write_snapshot(tmp / rel_path, ville, df, alertes, charts)
+            entries[_snapshot_key(ville, date_tuple)] = rel_path.as_posix()
+
+    index = {
+        "signature": signature,
+        "version": code_version(),
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "missing": missing,
+        "villes": villes_disponibles,
+        "date_min": date_min.isoformat(),
+        "date_max": date_max.isoformat(),
+        "entries": entries
+    }
+    (tmp / "index.json").write_text(json.dumps(index, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    old = store.with_name(store.name + ".old")
+    shutil.rmtree(old, ignore_errors=True)
+    if store.exists():
+        store.rename(old)
+    tmp.rename(store)
+    shutil.rmtree(old, ignore_errors=True)
+    return index
+
+# =============================
+# LECTURE
+# =============================
+def load_index(store=SNAPSHOT_DIR, base_dir=BASE_DIR):
+    """Index du magasin, ou None s'il est absent ou périmé (CSV ou code modifiés depuis)."""
+    path = Path(store) / "index.json"
+    if not path.exists():
+        return None
+    try:
+        index = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if index.get("signature") != data_signature(base_dir) or index.get("version") != code_version():
+        return None
+    index["date_min"] = date.fromisoformat(index["date_min"])
+    index["date_max"] = date.fromisoformat(index["date_max"])
+    return index
+
+def find_snapshot(index, ville, date_tuple, store=SNAPSHOT_DIR):
+    """Chemin de l'instantané correspondant exactement à la sélection, sinon None."""
+    if index is None:
+        return None
+    if isinstance(ville, list):
+        if len(ville) != 1:
+            return None
+        ville = ville[0]
+    rel_path = index["entries"].get(_snapshot_key(ville, date_tuple))
+    return Path(store) / rel_path if rel_path else None
+
+def load_snapshot(path):
+    """Charge un instantané : données filtrées, graphiques et PDF."""
+    path = Path(path)
+    charts_json = json.loads((path / "graphiques.json").read_text(encoding="utf-8"))
+    charts = [
+        (c["titre"], pio.from_json(c["fig"]) if c["fig"] is not None else None, c["message"])
+        for c in charts_json
+    ]
+    return {
+        "df": pd.read_pickle(path / "donnees.pkl"),
+        "charts": charts,
+        "pdf": (path / "rapport.pdf").read_bytes()
+    }
+
+def load_alertes(store=SNAPSHOT_DIR):
+    return pd.read_pickle(Path(store) / "alertes.pkl")
+
+# =============================
+# CLI
+# =============================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pré-calcule les rapports Waze par commune et période.")
+    parser.add_argument("--store", type=Path, default=SNAPSHOT_DIR, help="Répertoire des instantanés")
+    parser.add_argument("--ville", action="append", dest="villes", choices=VILLES_SERVICE_COMMUN,
+                        metavar="VILLE", help="Ne reconstruire qu'une commune (répétable) ; les autres sont conservées")
+    args = parser.parse_args(argv)
+
+    start = datetime.now()
+    index = build_snapshots(args.store, villes=args.villes)
+    duree = (datetime.now() - start).total_seconds()
+    print(f"{len(index['entries'])} instantanés dans {args.store} (mis à jour en {duree:.1f}s)")
+    if index["missing"]:
+        print(f"Fichiers absents : {', '.join(index['missing'])}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())